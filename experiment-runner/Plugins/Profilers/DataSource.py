@@ -251,7 +251,9 @@ class CLISource(DataSource):
             self.process.kill()
             raise RuntimeError(f"{self.source_name} process could not stop {e}")
         
-        self._validate_stop(stdout.decode("utf-8"), stderr.decode("utf-8"))
+        # stderr is None when a subclass routes it elsewhere (e.g. DEVNULL)
+        self._validate_stop(stdout.decode("utf-8"),
+                            stderr.decode("utf-8") if stderr is not None else "")
         return stdout.decode("utf-8")
 
 class DeviceSource(DataSource):
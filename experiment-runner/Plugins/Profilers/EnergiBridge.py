@@ -1,6 +1,8 @@
 from pathlib import Path
 import pandas as pd
 import re
+import shlex
+import subprocess
 from Plugins.Profilers.DataSource import CLISource, ParameterDict, ValueRef
 
 # Supported Paramters for the PowerJoular metrics plugin
@@ -24,7 +26,7 @@ class EnergiBridge(CLISource):
                  sample_frequency:      int                 = 200,
                  out_file:              Path                = "energibridge.csv",
                  summary:               bool                = True,
-                 target_program:        str                 = "sleep 1000000",
+                 target_program:        str | list          = "sleep 1000000",
                  additional_args:       dict                = {}):
         
         super().__init__()
@@ -69,6 +71,22 @@ class EnergiBridge(CLISource):
 
         return f"Energy consumption in joules: {total_joules} for {elapsed_time} sec of execution"
 
+    # The target program shares the profiler's stdio, so its stderr chatter
+    # (paddle's glog output, tesseract warnings, the scripts' error prints)
+    # would otherwise fill the pipe before stop() drains it and be reported
+    # as a profiler failure. Route stderr to /dev/null; the summary we care
+    # about arrives on stdout.
+    def start(self):
+        try:
+            self.process = subprocess.Popen(shlex.split(self._format_cmd()),
+                                            stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL)
+        except Exception as e:
+            self.process.kill()
+            raise RuntimeError(f"{self.source_name} process could not start: {e}")
+
+        self._validate_start()
+
     # We also want to save the summary of EnergiBridge if present
     def stop(self, wait=False):
 
@@ -92,27 +110,36 @@ class EnergiBridge(CLISource):
     def _format_cmd(self):
         cmd = super()._format_cmd()
 
-        return cmd + f" -- {self.target_program}"
-
-    @staticmethod
-    def parse_log(logfile: Path, summary_logfile: Path|None=None):
-        # Things are already in csv format here, no checks needed
-        log_data = pd.read_csv(logfile).to_dict()
+        target = self.target_program
+        if not isinstance(target, str):
+            # Accept an argv list; quote it so it survives the shlex round-trip
+            target = shlex.join(target)
 
-        if not summary_logfile:
-            return log_data
+        return cmd + f" -- {target}"
 
+    @staticmethod
+    def parse_summary(summary_logfile: Path):
         with open(summary_logfile, "r") as f:
             summary_data = f.read()
-            
+
             # Extract the floats from the string, we expect always positive X.X
             values = re.findall("[0-9]+[.]?[0-9]*", summary_data)
 
             if len(values) == 2:
                 summary_data = {
-                    "total_joules": float(values[0]), 
+                    "total_joules": float(values[0]),
                     "runtime_seconds": float(values[1])
                 }
 
-        return (log_data, summary_data)
+        return summary_data
+
+    @staticmethod
+    def parse_log(logfile: Path, summary_logfile: Path|None=None):
+        # Things are already in csv format here, no checks needed
+        log_data = pd.read_csv(logfile).to_dict()
+
+        if not summary_logfile:
+            return log_data
+
+        return (log_data, EnergiBridge.parse_summary(summary_logfile))
 
@@ -0,0 +1,40 @@
+"""Persistent PaddleOCR worker.
+
+Loads the OCR pipelines once at startup and then serves run requests read
+as JSON lines from stdin, so repeated runs do not pay the multi-second
+interpreter + model init of a fresh `run_paddle.py` invocation. After each
+run a single "OK" line is written to stdout; the RunnerConfig blocks on
+that line to know the run has finished.
+"""
+import sys
+import json
+
+from run_paddle import get_ocr, run_ocr
+
+
+def main():
+    # Warm both pipelines up front, before the first run request; get_ocr is
+    # memoized, so every run afterwards reuses the loaded models
+    for lang in ('eng', 'ara'):
+        get_ocr(lang)
+    print("OK", flush=True)  # signal the RunnerConfig that startup is done
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        params = json.loads(line)
+        try:
+            run_ocr(sample_size=params['sample_size'],
+                    seed=params['seed'],
+                    dataset=params['dataset'],
+                    run_dir=params['run_dir'],
+                    document_type=params['document_type'],
+                    language_type=params['language_type'])
+        except Exception as e:
+            print("Error in worker run:", e)
+        print("OK", flush=True)
+
+
+if __name__ == '__main__':
+    main()